@@ -1,20 +1,116 @@
 #!/usr/bin/env python3
 
 import logging
+import os
+import sys
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
 import yfinance
 import numpy as np
-import matplotlib
-from matplotlib import pyplot as plt
-import statsmodels.api as sm
+import pandas as pd
 
+try:
+    # the kernels below are given explicit signatures, so numba compiles them eagerly at import.
+    # With cache=True the machine code is stored in __pycache__ and reused by later runs
+    from numba import njit
+except ImportError:
+    # numba is optional: without it, the kernels below run as plain Python functions
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 
-# define the back-end for matplotlib
-matplotlib.use('GTK3Agg')
 
+# without a display server, plots are rendered off-screen and saved to files
+_HEADLESS = not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY'))
 
+# whether the user's input is read from a terminal, see `_read_line`
+_STDIN_IS_TTY = sys.stdin.isatty()
 
-def get_choice_path(menu):
+# whether the back-end for matplotlib was already defined, see `_pyplot`
+_backend_set = False
+
+
+# the stock symbols that can be analyzed, in upper case
+_SYMBOLS = frozenset(symbol.upper() for symbol in ('EBAY', 'ecl', 'Eix', 'ew', 'ea'))
+
+# the user's last choice path in the top-level menu, see `get_user_choice`
+_last_choice = None
+
+# the top-level menu, see `get_choice_path` for its structure
+_MAIN_MENU = {
+    'a': {
+        'msg': 'Display stock data',
+        'sub': {
+            'a': {
+                'msg': 'Display available stock symbols'
+            },
+            'b': {
+                'msg': 'Display statistics of a specific stock'
+            }
+        }
+    },
+    'b': {
+        'msg': 'Exit'
+    }
+}
+
+# the analysis options of a specific stock
+_ANALYZE_MENU = {
+    'a': {
+        'msg': 'Display statistics of the adjusted closing rate (Average / Standard Deviation / Maximum / Minimum)'
+    },
+    'b': {
+        'msg': 'Display statistics of the daily yield of the adjusted closing rate (Average / Standard Deviation / Maximum / Minimum)'
+    },
+    'c': {
+        'msg': 'Calculate the Sharpe metric'
+    },
+    'd': {
+        'msg': 'Plot a graph of the stock\'s exchange rates'
+    },
+    'e': {
+        'msg': 'Plot a graph of the daily yields' 
+    },
+    'f': {
+        'msg': 'Plot a histogram of the stock\'s exchange rates'
+    },
+    'g': {
+        'msg': 'Plot a histogram of the daily yields' 
+    },
+    'h': {
+        'msg': 'End analysis' 
+    },
+    'i': {
+        'msg': 'Calculate α' 
+    },
+    'j': {
+        'msg': 'Calculate β'
+    }
+}
+
+
+
+def _read_line(prompt=''):
+    """
+    Reads a line of user input, like `input(prompt)`.
+    When stdin is not a terminal (e.g. input piped from a file), the line is read directly
+    from the buffered stdin, skipping input()'s readline and terminal handling.
+    Anything written to stdout so far (e.g. a menu) is flushed once, right before reading.
+
+    @raise EOFError - if the input ended
+    """
+    if _STDIN_IS_TTY:
+        return input(prompt)
+
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if not line:
+        raise EOFError
+    return line.rstrip('\n')
+
+
+def get_choice_path(menu, default=None):
     """
     Prompts the user to make a choice out of the given `menu`.
     The structure of menu is as follows:
@@ -24,55 +120,84 @@ def get_choice_path(menu):
                 'sub': (optional) a sub-menu. It follows the same structure rules
             },
             ...
+            '_prompt': the text that lists the options above, as added by `_add_prompts`
+            '_invalid': the message shown on an invalid choice, as added by `_add_prompts`
         }
+    Keys that start with '_' hold such precomputed data, and are never valid choices.
+
+    If a `default` choice path is given, the user may enter an empty line at the top level of
+    the menu to choose it again without going through the sub-menus.
     
     @return - the choice path, i.e, the series of choices the user made until a concrete operation
               was reached.
     """
     menu_itr = menu
-    choice_path = ''
+    choice_path = []
     while True: 
-        for key in menu_itr:
-            print('{}. {}\n'.format(key, menu_itr[key]['msg']))
+        sys.stdout.write(menu_itr['_prompt'])
+        offer_default = default is not None and menu_itr is menu
+        if offer_default:
+            sys.stdout.write('Press Enter to repeat: {}\n'.format(_choice_msg(menu, default)))
         
-        choice = input()
-        if choice not in menu_itr:
-            print('Invalid option. Choose again: {}'.format('/'.join(menu_itr.keys())))
+        choice = _read_line()
+        if offer_default and choice == '':
+            return default
+
+        if choice.startswith('_') or choice not in menu_itr:
+            sys.stdout.write(menu_itr['_invalid'])
             continue
         
-        choice_path += choice
+        choice_path.append(choice)
 
         if 'sub' in menu_itr[choice]:
             menu_itr = menu_itr[choice]['sub']
         else:
-            return choice_path
+            return ''.join(choice_path)
+
+
+def _choice_msg(menu, choice_path):
+    """
+    @return - the message of the operation that `choice_path` reaches in `menu`
+    """
+    item = {'sub': menu}
+    for choice in choice_path:
+        item = item['sub'][choice]
+
+    return item['msg']
+
+
+def _add_prompts(menu):
+    """
+    Formats the texts that `get_choice_path` displays for `menu`, and stores them in the menu:
+    the list of options under '_prompt', and the invalid choice message under '_invalid'.
+    The sub-menus are handled recursively.
+    This function does not return a value.
+    """
+    choices = [key for key in menu if not key.startswith('_')]
+    menu['_prompt'] = ''.join('{}. {}\n\n'.format(key, menu[key]['msg']) for key in choices)
+    menu['_invalid'] = 'Invalid option. Choose again: {}\n'.format('/'.join(choices))
+
+    for key in choices:
+        if 'sub' in menu[key]:
+            _add_prompts(menu[key]['sub'])
+
+
+# the menus are static, so their prompts are formatted once, at import
+_add_prompts(_MAIN_MENU)
+_add_prompts(_ANALYZE_MENU)
 
 
 def get_user_choice():
     """
     Displays the menu, and prompts the user to enter their choice.
+    The user can repeat their previous choice by entering an empty line.
 
     @return - the user's "choice path": the series of choices the user made
               until an operation is chosen to be performed.
     """
-    menu = {
-        'a': {
-            'msg': 'Display stock data',
-            'sub': {
-                'a': {
-                    'msg': 'Display available stock symbols'
-                },
-                'b': {
-                    'msg': 'Display statistics of a specific stock'
-                }
-            }
-        },
-        'b': {
-            'msg': 'Exit'
-        }
-    }
-
-    return get_choice_path(menu)
+    global _last_choice
+    _last_choice = get_choice_path(_MAIN_MENU, default=_last_choice)
+    return _last_choice
 
 
 def get_user_input():
@@ -85,9 +210,9 @@ def get_user_input():
     
     Note: The dates are in the following format: yyyy-mm-dd
     """
-    stock = input('Enter desired stock: ')
-    start_date = input('Enter start date (yyyy-mm-dd): ')
-    end_date = input('Enter end date (yyyy-mm-dd): ')
+    stock = _read_line('Enter desired stock: ')
+    start_date = _read_line('Enter start date (yyyy-mm-dd): ')
+    end_date = _read_line('Enter end date (yyyy-mm-dd): ')
     return stock, start_date, end_date
 
 
@@ -98,50 +223,197 @@ def display_available_stocks(companies):
 
     @return - this function does not return a value
     """
-    print('Available stocks:')
-    print('\n'.join(companies))
+    sys.stdout.write('Available stocks:\n{}\n'.format('\n'.join(companies)))
+
+
+# the most recently used stock histories, keyed by (symbol, start_date, end_date, interval)
+_data_cache = OrderedDict()
 
+# the maximal number of stock histories kept in _data_cache
+_DATA_CACHE_SIZE = 128
 
-def fetch_data(symbol, start_date, end_date):
+
+def fetch_data(symbols, start_date, end_date):
     """
-    Downloads and returns a dataframe that represents the history of the given
-    stock `symbol` in the date range defined by `start_date` - `end_date` (inclusive)
+    Downloads the history of each of the given stock `symbols` in the date range defined by
+    `start_date` - `end_date` (inclusive).
+    Symbols that were recently downloaded for this date range are served from memory, and all
+    the others are downloaded together in a single batched request.
+    Failed downloads (empty histories) are not cached, so they are retried on the next call.
+
+    @return - a dict that maps each symbol to a dataframe of its history
     """
-    logging.debug('Fetching info for stock {} from {} until {}'.format(symbol, start_date, end_date))
+    logging.debug('Fetching info for stocks {} from {} until {}'.format(symbols, start_date, end_date))
     
-    interval = 'daily'
+    # the dates are compared and cached parsed, so that different spellings of a date agree
+    start_date = _parse_date(start_date)
+    end_date = _parse_date(end_date)
+
+    interval = '1d'
     if start_date == end_date:
         logging.debug('Using hourly interval')
-        interval = 'hourly'
+        interval = '1h'
     
-    data = yfinance.download(tickers=symbol, start=start_date, end=end_date, time_interval=interval)
-    logging.debug(data)
+    if end_date < start_date:
+        logging.debug('Empty date range, skipping the download')
+        return {symbol: pd.DataFrame() for symbol in symbols}
+
+    result = {}
+    for symbol in symbols:
+        key = (symbol, start_date, end_date, interval)
+        if key in _data_cache:
+            _data_cache.move_to_end(key)
+            result[symbol] = _data_cache[key]
+
+    missing = [symbol for symbol in symbols if symbol not in result]
+    if missing:
+        logging.debug('Downloading {}'.format(missing))
+        # yfinance treats the end date as exclusive
+        download_end = (end_date + timedelta(days=1)).isoformat()
+        data = yfinance.download(tickers=' '.join(missing), start=start_date.isoformat(), end=download_end,
+                                 interval=interval, group_by='ticker', threads=True, progress=False)
+        for symbol in missing:
+            result[symbol] = _split_ticker(data, symbol)
+            if not result[symbol].empty:
+                _data_cache[(symbol, start_date, end_date, interval)] = result[symbol]
+
+        while len(_data_cache) > _DATA_CACHE_SIZE:
+            _data_cache.popitem(last=False)
+
+    logging.debug(result)
+
+    return result
+
+
+def _parse_date(text):
+    """
+    Parses the date `text`, in any format pandas understands (e.g. yyyy-mm-dd, yyyy-m-d or mm/dd/yyyy).
+
+    @return - the parsed datetime.date
+    @raise ValueError - if `text` is not a valid date
+    """
+    timestamp = pd.Timestamp(text)
+    if pd.isna(timestamp):
+        raise ValueError('Missing date')
 
-    return data
+    return timestamp.date()
 
 
-def get_stats(arr):
+def _split_ticker(data, symbol):
+    """
+    Extracts the history of a single stock `symbol` out of a dataframe returned by
+    yfinance.download(group_by='ticker').
+    For several tickers, the columns are indexed by (ticker, field) and rows in which only
+    the other tickers traded are dropped.
+    A ticker whose download failed yields an empty dataframe.
+    """
+    if data.columns.nlevels == 1:
+        return data
+
+    if symbol.upper() not in data.columns.get_level_values(0):
+        return pd.DataFrame()
+
+    return data[symbol.upper()].dropna(how='all')
+
+
+# the history of a stock as contiguous float64 arrays, one per dataframe column.
+# `dates` holds the trading days, and `returns` the daily yields of `adj_close`
+StockArrays = namedtuple('StockArrays', 'dates open high low close adj_close volume returns')
+
+
+def extract_arrays(data):
+    """
+    Converts the dataframe `data` (as returned from yfinance.download) to a `StockArrays`.
+    The analyses then work on plain numpy arrays and never go through pandas.
+    An empty dataframe (e.g. of a failed download, which may lack the columns) yields empty arrays.
+    """
+    def column(name):
+        if data.empty:
+            return np.empty(0, dtype=np.float64)
+
+        # a private copy: the numba kernels only accept writable arrays, and pandas may return read-only views
+        return data[name].to_numpy(dtype=np.float64, copy=True)
+
+    adj_close = column('Adj Close')
+    return StockArrays(dates=data.index.to_numpy(),
+                       open=column('Open'),
+                       high=column('High'),
+                       low=column('Low'),
+                       close=column('Close'),
+                       adj_close=adj_close,
+                       volume=column('Volume'),
+                       returns=_pct_change(adj_close))
+
+
+def get_stats(arr, ddof=0):
     """
     Calculates and returns the following stats for the given numpy-like array `arr`:
         - Average
-        - Standard deviation
+        - Standard deviation, with `ddof` delta degrees of freedom (0 for the population's,
+          1 for the sample's)
         - Maximum
         - Minimum
     
-    @return - a tuple containing the metrics above, in the specified order (left-to-right)
+    @return - a tuple containing the metrics above, in the specified order (left-to-right).
+              All of them are NaN when `arr` is empty.
     """
+    if arr.size == 0:
+        return (np.nan, np.nan, np.nan, np.nan)
+
+    # the kernel only handles finite values, numpy propagates NaN and inf as the stats expect
+    if isinstance(arr, np.ndarray) and arr.ndim == 1 and np.isfinite(arr).all():
+        return _stats_kernel(np.require(arr, np.float64, ['C_CONTIGUOUS', 'WRITEABLE']), ddof)
+
     average = arr.mean()
-    std_dev = arr.std()
+    std_dev = arr.std(ddof=ddof)
     maximum = arr.max()
     minimum = arr.min()
 
     return (average, std_dev, maximum, minimum)
 
 
-def display_closing_summary(data, symbol):
+@njit('UniTuple(f8, 4)(f8[::1], i8)', cache=True)
+def _stats_kernel(arr, ddof):
     """
-    data - A pandas DataFrame as returned from yfinance.
-           It contains the following columns: Open | High | Low | Close | Adj Close | Volume
+    Calculates the stats of `get_stats` for a non-empty 1-D float64 array in a single pass.
+    The variance is accumulated with Welford's method, which avoids the cancellation
+    of the naive sum-of-squares formula on rates with a small spread.
+    The array must only contain finite values: NaN and inf are left to numpy, see `get_stats`.
+    """
+    n = arr.shape[0]
+    mean = 0.0
+    m2 = 0.0
+    maximum = arr[0]
+    minimum = arr[0]
+    for i in range(n):
+        x = arr[i]
+        delta = x - mean
+        mean += delta / (i + 1)
+        m2 += delta * (x - mean)
+        if x > maximum:
+            maximum = x
+        if x < minimum:
+            minimum = x
+
+    std_dev = np.nan
+    if n > ddof:
+        std_dev = (m2 / (n - ddof)) ** 0.5
+
+    return (mean, std_dev, maximum, minimum)
+
+
+@njit('f8[::1](f8[::1])', cache=True)
+def _pct_change(rates):
+    """
+    Calculates the relative change between consecutive entries of the 1-D float64 array `rates`.
+    Equivalent to pandas' `pct_change()[1:]`, without the pandas overhead.
+    """
+    return rates[1:] / rates[:-1] - 1.0
+
+
+def display_closing_summary(arrays, symbol):
+    """
+    arrays - The stock's history, as a `StockArrays` built by `extract_arrays`
     
     This function displays the following information about the adjusted closing rate:
         - Average
@@ -149,17 +421,15 @@ def display_closing_summary(data, symbol):
         - Maximum
         - Minimum
     """
-    adjusted_closing_rates = data['Adj Close'].to_numpy()
-    stats = get_stats(adjusted_closing_rates)
+    stats = get_stats(arrays.adj_close)
 
     print('{}: Statistics of the stock\'s closing rate:'.format(symbol))
     print('Average: {}\nStandard Deviation: {}\nMaximum: {}\nMinimum: {}'.format(*stats))
 
 
-def display_daily_yield_stats(data, symbol):
+def display_daily_yield_stats(arrays, symbol):
     """
-    data - A pandas DataFrame as returned from yfinance.
-           It contains the following columns: Open | High | Low | Close | Adj Close | Volume
+    arrays - The stock's history, as a `StockArrays` built by `extract_arrays`
     
     This function displays the following information about the daily yield:
         - Average
@@ -167,182 +437,255 @@ def display_daily_yield_stats(data, symbol):
         - Maximum
         - Minimum
     """
-    daily_yields =  data['Adj Close'].pct_change()[1:]
-    logging.debug(daily_yields)
-    stats = get_stats(daily_yields)
+    logging.debug(arrays.returns)
+    # the sample standard deviation, as pandas reports for the daily yields
+    stats = get_stats(arrays.returns, ddof=1)
 
     print('{}: Statistics of the stock\'s daily yields:'.format(symbol))
     print('Average: {}\nStandard Deviation: {}\nMaximum: {}\nMinimum: {}'.format(*stats))
 
 
-def calculate_sharpe_metric(data, symbol):
+def calculate_sharpe_metric(arrays, symbol):
     """
     Calculates and displays Sharpe metric according to the following formula:
         S = r / d
-        Where r is the average of daily returns, and d is the standard deviation of the daily returns
-    
+        Where r is the average of daily returns, and d is the (sample) standard deviation of the daily returns
+    The returns are derived from the adjusted closing rates in `arrays` on the fly,
+    so the precomputed `arrays.returns` are not needed here.
+
     @return - S, the Sharpe metric 
     """
-    daily_yields =  data['Adj Close'].pct_change()[1:]
-    average, std_dev, _, _ = get_stats(daily_yields)
-    s = average / std_dev
+    s = _sharpe_kernel(arrays.adj_close)
 
     print('{}: Sharpe metric: {}'.format(symbol, s))
     return s
 
 
-def plot_exchange_rates(data, symbol):
+@njit('f8(f8[::1])', cache=True)
+def _sharpe_kernel(rates):
+    """
+    Calculates the Sharpe metric of a 1-D float64 array of adjusted closing `rates` in a single pass.
+    The daily returns are computed on the fly and their mean and variance are accumulated
+    with Welford's method, so no intermediate array of returns is allocated.
+    Like the division it replaces, the metric is NaN when it is undefined: with fewer than two
+    returns (three rates), or when the returns do not vary.
+    """
+    mean = 0.0
+    m2 = 0.0
+    for i in range(1, rates.shape[0]):
+        r = rates[i] / rates[i - 1] - 1.0
+        delta = r - mean
+        mean += delta / i
+        m2 += delta * (r - mean)
+
+    if rates.shape[0] < 3 or m2 == 0.0:
+        return np.nan
+
+    # the sample variance of the rates.shape[0] - 1 returns
+    return mean / (m2 / (rates.shape[0] - 2)) ** 0.5
+
+
+def _pyplot():
+    """
+    Imports and returns matplotlib's pyplot module.
+    matplotlib is only loaded once a plot is requested, which keeps the start-up time short.
+    On the first call, the back-end is defined: Agg when running headless, GTK3Agg otherwise.
+    The back-end can also be chosen explicitly through $MPL_BACKEND
+    """
+    global _backend_set
+    import matplotlib
+
+    if not _backend_set:
+        matplotlib.use(os.environ.get('MPL_BACKEND', 'Agg' if _HEADLESS else 'GTK3Agg'))
+        _backend_set = True
+
+    from matplotlib import pyplot
+    return pyplot
+
+
+def _show_figure(figure, name):
+    """
+    Displays the given matplotlib `figure`, or saves it to `<name>.png` when running headless.
+    The figure is closed afterwards, so it does not stay in memory across menu choices.
+    """
+    plt = _pyplot()
+    if _HEADLESS:
+        logging.debug('Saving the plot to {}.png'.format(name))
+        figure.savefig('{}.png'.format(name), dpi=90)
+    else:
+        plt.show()
+
+    plt.close(figure)
+
+
+def _for_plot(values):
+    """
+    Converts the numpy array `values` to float32 for plotting.
+    Single precision is plenty for rendering, and halves the data that matplotlib processes.
+    The statistics keep working on the float64 arrays.
+    """
+    return values.astype(np.float32, copy=False)
+
+
+def _plot_histogram(values, bins=10):
+    """
+    Plots a histogram of the numpy array `values` on the current figure.
+    The values are binned by numpy and drawn as a single bar plot.
+    Like `plt.hist`, missing (NaN) values are left out.
+    """
+    plt = _pyplot()
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(_for_plot(values), bins=bins)
+    plt.bar(edges[:-1], counts, width=np.diff(edges), align='edge')
+
+
+def plot_exchange_rates(arrays, symbol):
     """
     Plots the opening and the adjusted closing rates of the given stock.
-    The stock rates are represented in the dataframe `data` (as returned from yfinance.download)
+    The stock rates are given in `arrays` (a `StockArrays` as built by `extract_arrays`)
     """
     logging.debug('Plotting exchange rate for {}'.format(symbol))
-    plt.figure(figsize=(15, 10))
+    plt = _pyplot()
+    figure = plt.figure(figsize=(15, 10))
     plt.rc('xtick', labelsize=7)
     plt.rc('ytick', labelsize=7)
-    plt.plot(data['Adj Close'], linewidth=2, color='blue', label='Adjusted Closing Rates')
-    plt.plot(data['Open'], linewidth=2, color='silver', label='Opening Rates')
+    plt.plot(arrays.dates, _for_plot(arrays.adj_close), linewidth=2, color='blue', label='Adjusted Closing Rates')
+    plt.plot(arrays.dates, _for_plot(arrays.open), linewidth=2, color='silver', label='Opening Rates')
     plt.xlabel('Date', fontsize=13)
     plt.legend()
     plt.title('The exchange rates for {}'.format(symbol))
-    plt.show()
+    _show_figure(figure, '{}_exchange_rates'.format(symbol))
 
 
-def plot_daily_yields(data, symbol):
+def plot_daily_yields(arrays, symbol):
     """
     Plots the daily yields (returns) of the given stock.
-    The stock rates are represented in the dataframe `data` (as returned from yfinance.download)
+    The stock rates are given in `arrays` (a `StockArrays` as built by `extract_arrays`)
     """
     logging.debug('Plotting daily yields for {}'.format(symbol))
-    plt.figure(figsize=(15, 10))
+    plt = _pyplot()
+    figure = plt.figure(figsize=(15, 10))
     plt.rc('xtick', labelsize=7)
     plt.rc('ytick', labelsize=7)
 
-    yields = data['Adj Close'].pct_change()[1:]
-    plt.plot(yields, linewidth=2, color='black')
+    plt.plot(arrays.dates[1:], _for_plot(arrays.returns), linewidth=2, color='black')
     
     plt.xlabel('Date', fontsize=13)
     plt.ylabel('Daily Yields', fontsize=13)
     plt.title('Daily yields of {}'.format(symbol))
-    plt.show()
+    _show_figure(figure, '{}_daily_yields'.format(symbol))
 
 
-def plot_exchange_rates_hist(data, symbol):
+def plot_exchange_rates_hist(arrays, symbol):
     """
     Plots a histogram of the closing adjusted closing rates of the given stock.
-    The stock rates are represented in the dataframe `data` (as returned from yfinance.download)
+    The stock rates are given in `arrays` (a `StockArrays` as built by `extract_arrays`)
     """
     logging.debug('Plotting a histogram of exchange rates of {}'.format(symbol))
-    plt.figure(figsize=(15, 10))
+    plt = _pyplot()
+    figure = plt.figure(figsize=(15, 10))
     plt.title('A histogram of exchange rates of {}'.format(symbol))
-    plt.hist(data['Adj Close'])
-    plt.show()
+    _plot_histogram(arrays.adj_close)
+    _show_figure(figure, '{}_exchange_rates_hist'.format(symbol))
 
 
-def plot_daily_yields_hist(data, symbol):
+def plot_daily_yields_hist(arrays, symbol):
     """
     Plots a histogram of the daily returns (yields) of the given stock.
-    The stock rates are represented in the dataframe `data` (as returned from yfinance.download)
+    The stock rates are given in `arrays` (a `StockArrays` as built by `extract_arrays`)
     """
     logging.debug('Plotting a histogram of daily yields of {}'.format(symbol))
-    plt.figure(figsize=(15, 10))
+    plt = _pyplot()
+    figure = plt.figure(figsize=(15, 10))
     plt.title('A histogram of the daily yields of {}'.format(symbol))
-    yields = data['Adj Close'].pct_change()[1:]
-    plt.hist(yields)
-    plt.show()
+    _plot_histogram(arrays.returns)
+    _show_figure(figure, '{}_daily_yields_hist'.format(symbol))
 
 
-def calculate_alpha_beta(data, symbol, start_date, end_date):
+def calculate_alpha_beta(arrays, benchmark_arrays, symbol):
     """
     Calculates Jensen's alpha and beta coefficients.
-    The regression is done against the S&P500 stock in the date range `start_date` - `end_date` (inclusive)
+    The regression is done against the S&P500 stock, whose history is given in `benchmark_arrays`
+    (a `StockArrays` covering the same date range as `arrays`)
 
     @return - a tuple: (alpha, beta)
     """
-    logging.debug('Calculating alpha of {}'.format(symbol))
+    # scipy is only needed here, so it is imported on demand to keep the start-up time short
+    from scipy.stats import linregress
 
-    benchmark_data = fetch_data('SPY', start_date, end_date)
-    benchmark_returns = benchmark_data['Adj Close'].pct_change()
+    logging.debug('Calculating alpha of {}'.format(symbol))
 
-    X = benchmark_returns[1:]
-    X = sm.add_constant(X)
-    
-    Y = data['Adj Close'].pct_change()[1:]
+    if np.array_equal(arrays.dates, benchmark_arrays.dates):
+        X = benchmark_arrays.returns
+        Y = arrays.returns
+    else:
+        # only regress over the days in which both stocks were traded
+        _, indices, benchmark_indices = np.intersect1d(arrays.dates, benchmark_arrays.dates,
+                                                       return_indices=True)
+        X = _pct_change(benchmark_arrays.adj_close[benchmark_indices])
+        Y = _pct_change(arrays.adj_close[indices])
     
-    model = sm.OLS(Y, X).fit()
-    coeff = model.params
+    regression = linregress(X, Y)
+    coeff = (regression.intercept, regression.slope)
 
     logging.debug('α = {}, β = {}'.format(*coeff))
 
     return coeff
 
 
+# the analysis operations that only need the stock's history, by their choice in _ANALYZE_MENU
+_HANDLERS = {
+    'a': display_closing_summary,
+    'b': display_daily_yield_stats,
+    'c': calculate_sharpe_metric,
+    'd': plot_exchange_rates,
+    'e': plot_daily_yields,
+    'f': plot_exchange_rates_hist,
+    'g': plot_daily_yields_hist
+}
+
+
 def analyze_stock(symbol, start_date, end_date):
     """
     Displays a list of available analysis options, and prompts the user for a choice.
     On choice, the corresponding analysis is run and results are displayed to the user.
+    The user is prompted again until they choose to end the analysis, and all the analyses
+    share a single download of the stock's history.
     This function does not return a value.
     """
-    menu = {
-        'a': {
-            'msg': 'Display statistics of the adjusted closing rate (Average / Standard Deviation / Maximum / Minimum)'
-        },
-        'b': {
-            'msg': 'Display statistics of the daily yield of the adjusted closing rate (Average / Standard Deviation / Maximum / Minimum)'
-        },
-        'c': {
-            'msg': 'Calculate the Sharpe metric'
-        },
-        'd': {
-            'msg': 'Plot a graph of the stock\'s exchange rates'
-        },
-        'e': {
-            'msg': 'Plot a graph of the daily yields' 
-        },
-        'f': {
-            'msg': 'Plot a histogram of the stock\'s exchange rates'
-        },
-        'g': {
-            'msg': 'Plot a histogram of the daily yields' 
-        },
-        'h': {
-            'msg': 'End analysis' 
-        },
-        'i': {
-            'msg': 'Calculate α' 
-        },
-        'j': {
-            'msg': 'Calculate β'
-        }
-    }
+    # the benchmark is downloaded along with the stock, so α/β need no further request
+    frames = fetch_data([symbol, 'SPY'], start_date, end_date)
+    if frames[symbol].empty:
+        print('No data is available for {} between {} and {}'.format(symbol, start_date, end_date))
+        return
+
+    arrays = extract_arrays(frames[symbol])
+    # without benchmark data only α/β are unavailable, the other analyses still run
+    benchmark_arrays = None
+    if not frames['SPY'].empty:
+        benchmark_arrays = extract_arrays(frames['SPY'])
 
-    choice = get_choice_path(menu)
-    
-    handlers = {
-        'a': display_closing_summary,
-        'b': display_daily_yield_stats,
-        'c': calculate_sharpe_metric,
-        'd': plot_exchange_rates,
-        'e': plot_daily_yields,
-        'f': plot_exchange_rates_hist,
-        'g': plot_daily_yields_hist
-    }
+    while True:
+        choice = get_choice_path(_ANALYZE_MENU)
+        if choice == 'h':
+            return
+
+        if choice in _HANDLERS:
+            _HANDLERS[choice](arrays, symbol)
+        elif choice == 'i' or choice == 'j':
+            if benchmark_arrays is None:
+                print('No benchmark data (SPY) is available between {} and {}'.format(start_date, end_date))
+                continue
 
-    data = fetch_data(symbol, start_date, end_date)
-    if choice in handlers:
-        handlers[choice](data, symbol)
-    elif choice == 'i' or choice == 'j':
-        alpha, beta = calculate_alpha_beta(data, symbol, start_date, end_date)
+            alpha, beta = calculate_alpha_beta(arrays, benchmark_arrays, symbol)
 
-        if (choice == 'i'):
-            print('The alpha of {} is {}'.format(symbol, alpha))
-        else:
-            print('The beta of {} is {}'.format(symbol, beta))
+            if (choice == 'i'):
+                print('The alpha of {} is {}'.format(symbol, alpha))
+            else:
+                print('The beta of {} is {}'.format(symbol, beta))
 
 
 def main():
-    symbols = ['EBAY', 'ecl', 'Eix', 'ew', 'ea']
-
     while True:
         choice = get_user_choice()
         logging.debug('User\'s choice: {}'.format(choice))
@@ -350,11 +693,18 @@ def main():
         if choice == 'b':
             break
         elif choice == 'aa':
-            display_available_stocks(symbols)
+            display_available_stocks(sorted(_SYMBOLS))
         elif choice == 'ab':
             symbol, start_date, end_date = get_user_input()
-            if symbol not in symbols:
-                print('The selected company "{}" is not among the available stock symbols'.format(symbol))
+            symbol = symbol.upper()
+            if symbol not in _SYMBOLS:
+                sys.stdout.write('The selected company "{}" is not among the available stock symbols\n'.format(symbol))
+                continue
+            try:
+                start_date = _parse_date(start_date).isoformat()
+                end_date = _parse_date(end_date).isoformat()
+            except ValueError:
+                sys.stdout.write('Invalid date range "{}" - "{}". Use the format yyyy-mm-dd\n'.format(start_date, end_date))
                 continue
             analyze_stock(symbol, start_date, end_date)
 